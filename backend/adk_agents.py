@@ -20,14 +20,25 @@ def _build_registry() -> Dict[str, Agent]:
 
 AGENT_REGISTRY: Dict[str, Agent] = _build_registry()
 
+# Bumped whenever the registry is rebuilt, so callers can cache derived data
+_registry_version = 0
+
 
 def rebuild_agents():
     """Rebuild all agents (e.g. after model change)."""
-    global AGENT_REGISTRY
+    global AGENT_REGISTRY, _registry_version
     AGENT_REGISTRY = _build_registry()
+    _registry_version += 1
     print(f"Agents rebuilt with model: {get_current_model()}")
 
 
+def registry_version() -> int:
+    """
+    Current registry version / 当前注册表版本
+    """
+    return _registry_version
+
+
 def get_agent(agent_name: str) -> Optional[Agent]:
     """
     Get an agent by name / 通过名称获取代理
@@ -5,6 +5,7 @@ Admin API endpoints for managing API keys and posts
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List, Optional
+import threading
 import uuid
 from datetime import datetime
 
@@ -19,14 +20,18 @@ from models import (
     AdminLogin, AdminCreate, AdminResponse
 )
 from auth import get_current_admin, require_super_admin, create_access_token, get_password_hash, verify_password
+from post_context import invalidate_post_context
 
 router = APIRouter(prefix="/api/admin", tags=["Admin"])
 
+# Endpoints run in the threadpool, so serialize knowledge base rebuilds
+_rag_update_lock = threading.Lock()
+
 
 # ==================== Authentication ====================
 
 @router.post("/login")
-async def admin_login(login_data: AdminLogin, db: Session = Depends(get_db)):
+def admin_login(login_data: AdminLogin, db: Session = Depends(get_db)):
     """Admin login"""
     admin = db.query(AdminUser).filter(AdminUser.username == login_data.username).first()
 
@@ -51,7 +56,7 @@ async def admin_login(login_data: AdminLogin, db: Session = Depends(get_db)):
 
 
 @router.get("/me")
-async def get_current_admin_info(
+def get_current_admin_info(
     current_admin: AdminUser = Depends(get_current_admin),
 ):
     """Get current logged-in admin info"""
@@ -59,7 +64,7 @@ async def get_current_admin_info(
 
 
 @router.post("/logout")
-async def admin_logout(
+def admin_logout(
     current_admin: AdminUser = Depends(get_current_admin),
 ):
     """Admin logout"""
@@ -67,7 +72,7 @@ async def admin_logout(
 
 
 @router.post("/users")
-async def create_admin_user(
+def create_admin_user(
     admin_data: AdminCreate,
     current_admin: AdminUser = Depends(require_super_admin),
     db: Session = Depends(get_db)
@@ -100,7 +105,7 @@ async def create_admin_user(
 # ==================== API Key Management ====================
 
 @router.get("/api-keys/effective")
-async def get_effective_api_keys(
+def get_effective_api_keys(
     current_admin: AdminUser = Depends(get_current_admin),
     db: Session = Depends(get_db)
 ):
@@ -138,7 +143,7 @@ async def get_effective_api_keys(
 
 
 @router.get("/api-keys")
-async def list_api_keys(
+def list_api_keys(
     skip: int = 0,
     limit: int = 100,
     current_admin: AdminUser = Depends(get_current_admin),
@@ -166,7 +171,7 @@ async def list_api_keys(
 
 
 @router.post("/api-keys", status_code=status.HTTP_201_CREATED)
-async def create_api_key(
+def create_api_key(
     api_key_data: APIKeyCreate,
     current_admin: AdminUser = Depends(get_current_admin),
     db: Session = Depends(get_db)
@@ -200,7 +205,7 @@ async def create_api_key(
 
 
 @router.get("/api-keys/{key_id}")
-async def get_api_key(
+def get_api_key(
     key_id: int,
     current_admin: AdminUser = Depends(get_current_admin),
     db: Session = Depends(get_db)
@@ -225,7 +230,7 @@ async def get_api_key(
 
 
 @router.put("/api-keys/{key_id}")
-async def update_api_key(
+def update_api_key(
     key_id: int,
     api_key_data: APIKeyUpdate,
     current_admin: AdminUser = Depends(get_current_admin),
@@ -265,7 +270,7 @@ async def update_api_key(
 
 
 @router.delete("/api-keys/{key_id}")
-async def delete_api_key(
+def delete_api_key(
     key_id: int,
     current_admin: AdminUser = Depends(get_current_admin),
     db: Session = Depends(get_db)
@@ -291,7 +296,7 @@ def mask_api_key(key_value: str) -> str:
 # ==================== Model Management ====================
 
 @router.get("/models")
-async def list_models(
+def list_models(
     current_admin: AdminUser = Depends(get_current_admin),
 ):
     """List available AI models"""
@@ -303,7 +308,7 @@ async def list_models(
 
 
 @router.get("/models/current")
-async def get_model(
+def get_model(
     current_admin: AdminUser = Depends(get_current_admin),
 ):
     """Get current AI model"""
@@ -311,7 +316,7 @@ async def get_model(
 
 
 @router.put("/models/current")
-async def update_model(
+def update_model(
     payload: dict,
     current_admin: AdminUser = Depends(get_current_admin),
 ):
@@ -339,7 +344,7 @@ async def update_model(
 # ==================== Post Management ====================
 
 @router.get("/posts")
-async def list_posts(
+def list_posts(
     skip: int = 0,
     limit: int = 20,
     language: Optional[str] = None,
@@ -377,7 +382,7 @@ async def list_posts(
 
 
 @router.post("/posts", status_code=status.HTTP_201_CREATED)
-async def create_post(
+def create_post(
     post_data: PostCreate,
     current_admin: AdminUser = Depends(get_current_admin),
     db: Session = Depends(get_db)
@@ -406,7 +411,8 @@ async def create_post(
             tags=post_data.tags,
             language=post_data.language,
         )
-        _knowledge_base.add_post(kb_post)
+        with _rag_update_lock:
+            _knowledge_base.add_post(kb_post)
     except Exception as e:
         print(f"Warning: Failed to update RAG vector store: {e}")
 
@@ -424,7 +430,7 @@ async def create_post(
 
 
 @router.get("/posts/{post_id}")
-async def get_post(
+def get_post(
     post_id: str,
     current_admin: AdminUser = Depends(get_current_admin),
     db: Session = Depends(get_db)
@@ -449,7 +455,7 @@ async def get_post(
 
 
 @router.put("/posts/{post_id}")
-async def update_post(
+def update_post(
     post_id: str,
     post_data: PostUpdate,
     current_admin: AdminUser = Depends(get_current_admin),
@@ -478,11 +484,15 @@ async def update_post(
     # Trigger RAG update: reload posts from MySQL first, then rebuild vectors
     from knowledge_base_agent import _knowledge_base
     try:
-        _knowledge_base.load_posts()
-        _knowledge_base._generate_all_embeddings()
+        with _rag_update_lock:
+            _knowledge_base.load_posts()
+            _knowledge_base._generate_all_embeddings()
     except Exception as e:
         print(f"Warning: Failed to update RAG vector store: {e}")
 
+    # Drop cached chat context for this post
+    invalidate_post_context(post_id)
+
     tags = post.tags.split(",") if post.tags else []
     resp = PostResponse(
         id=post.id,
@@ -498,7 +508,7 @@ async def update_post(
 
 
 @router.delete("/posts/{post_id}")
-async def delete_post(
+def delete_post(
     post_id: str,
     current_admin: AdminUser = Depends(get_current_admin),
     db: Session = Depends(get_db)
@@ -514,19 +524,18 @@ async def delete_post(
     # Trigger RAG update: reload posts and rebuild vectors
     from knowledge_base_agent import _knowledge_base
     try:
-        _knowledge_base.load_posts()
-        _knowledge_base._generate_all_embeddings()
+        with _rag_update_lock:
+            _knowledge_base.load_posts()
+            _knowledge_base._generate_all_embeddings()
     except Exception as e:
         print(f"Warning: Failed to update RAG vector store: {e}")
 
+    invalidate_post_context(post_id)
+
     # Clear knowledge agent session so stale chat history won't affect future answers
     try:
-        from main import _session_service
-        _session_service.delete_session_sync(
-            user_id="api_user",
-            session_id="api_knowledge",
-            app_name="agents"
-        )
+        from main import _forget_session
+        _forget_session(user_id="api_user", session_id="api_knowledge")
     except Exception as e:
         print(f"Warning: Failed to clear knowledge session: {e}")
 
@@ -58,7 +58,7 @@ def verify_token(token: str) -> Optional[dict]:
         return None
 
 
-async def get_current_admin(
+def get_current_admin(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
 ) -> AdminUser:
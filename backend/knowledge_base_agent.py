@@ -7,9 +7,14 @@ This module implements a knowledge base agent that can:
 - Show related posts and reasoning
 """
 
-from typing import Dict, List, Optional, Tuple
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+import hashlib
 import json
 import os
+import re
+import threading
 from pathlib import Path
 from dotenv import load_dotenv
 import numpy as np
@@ -19,21 +24,32 @@ load_dotenv()
 
 # Try to import LangChain for RAG with OpenAI embeddings (no torch required)
 try:
+    import faiss
     from langchain_openai import OpenAIEmbeddings
     from langchain_community.vectorstores import FAISS
+    from langchain_community.docstore.in_memory import InMemoryDocstore
     from langchain_core.documents import Document
     RAG_AVAILABLE = True
 except ImportError:
     try:
         # Try alternative import paths
+        import faiss
         from langchain.embeddings import OpenAIEmbeddings
         from langchain.vectorstores import FAISS
+        from langchain.docstore.in_memory import InMemoryDocstore
         from langchain.schema import Document
         RAG_AVAILABLE = True
     except ImportError:
         RAG_AVAILABLE = False
         print("Warning: LangChain with OpenAI embeddings not installed. RAG functionality will not be available.")
 
+# Try to import rapidfuzz for typo-tolerant title matching (optional)
+try:
+    from rapidfuzz import fuzz, process
+    FUZZY_AVAILABLE = True
+except ImportError:
+    FUZZY_AVAILABLE = False
+
 from google.adk.agents import Agent
 from google.adk.tools import BaseTool
 from pydantic import BaseModel, Field
@@ -61,6 +77,98 @@ class SearchResult(BaseModel):
     reason: str  # Why this post is relevant
 
 
+class _QueryCtx(NamedTuple):
+    """Per-query state built once in search_posts and shared by every candidate"""
+    phrase: str  # lowercased query without surrounding punctuation
+    phrase_bytes: bytes
+    token_bytes: Tuple[bytes, ...]
+    query_vector: List[float]  # embedded before taking the index lock
+    language: Optional[str]
+    fetch_k: int
+
+
+# Embedding API requests: texts per request, and requests in flight at once
+_EMBED_BATCH_SIZE = 256
+_EMBED_MAX_WORKERS = 4
+
+# Latin/digit words, or single CJK characters (whitespace cannot split Chinese)
+_TOKEN_RE = re.compile(r"[A-Za-z0-9_]+|[\u4e00-\u9fff]")
+# Fuzzy title matching: minimum edit ratio (0-100) and shortest title word considered
+_FUZZY_SCORE_CUTOFF = 80
+_FUZZY_MIN_WORD_LEN = 2
+
+# Leading/trailing punctuation and whitespace, e.g. the "？" in "FastAPI？"
+_EDGE_RE = re.compile(r"^\W+|\W+$")
+
+
+def _trigrams(text: str) -> Set[str]:
+    """Character 3-gram windows of a (lowercased) text"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _merge_layers(layers: List[List[SearchResult]], top_k: int) -> List[SearchResult]:
+    """Concatenate result layers in priority order, keeping the first hit per post"""
+    seen = set()
+    merged = []
+    for layer in layers:
+        for result in layer:
+            if result.post_id in seen:
+                continue
+            seen.add(result.post_id)
+            merged.append(result)
+            if len(merged) >= top_k:
+                return merged
+    return merged
+
+
+def _sample_posts() -> List[Post]:
+    """Sample posts used to seed an empty knowledge base"""
+    return [
+        Post(
+            id="post_001",
+            title="Python Virtual Environment Guide",
+            content="Python virtual environments are essential tools for isolating project dependencies. Use 'python -m venv venv' to create a virtual environment, and 'source venv/bin/activate' to activate it. Virtual environments help avoid dependency conflicts between different projects.",
+            tags=["Python", "Virtual Environment", "Development Tools"],
+            language="en"
+        ),
+        Post(
+            id="post_002",
+            title="FastAPI Quick Start",
+            content="FastAPI is a modern, fast web framework. It's based on Python type hints and automatically generates API documentation. Use the @app.get() decorator to define routes, and it supports asynchronous request handling.",
+            tags=["FastAPI", "Python", "Web Development"],
+            language="en"
+        ),
+        Post(
+            id="post_003",
+            title="Google ADK Agent Development",
+            content="Google ADK (Agent Development Kit) is a framework for building AI agents. It supports custom tools, plugins, and multi-agent systems. Use the Agent class to create agents, and run them through the Runner.",
+            tags=["Google ADK", "AI", "Agent Development"],
+            language="en"
+        )
+    ]
+
+
+class _PostsView(Mapping):
+    """Read-only post_id -> Post view over the positional post storage"""
+    __slots__ = ("_posts", "_id_to_row")
+
+    def __init__(self, posts: List[Post], id_to_row: Dict[str, int]):
+        self._posts = posts
+        self._id_to_row = id_to_row
+
+    def __getitem__(self, post_id: str) -> Post:
+        return self._posts[self._id_to_row[post_id]]
+
+    def __contains__(self, post_id) -> bool:
+        return post_id in self._id_to_row
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._id_to_row)
+
+    def __len__(self) -> int:
+        return len(self._posts)
+
+
 # ==================== Knowledge Base Storage ====================
 
 class KnowledgeBase:
@@ -72,7 +180,9 @@ class KnowledgeBase:
     2. FAISS vector store for efficient similarity search
     3. Requires OPENAI_API_KEY environment variable
     
-    RAG is mandatory - keyword matching fallback is not used.
+    RAG is mandatory and always runs. Single-word queries are additionally matched
+    exactly (character-trigram index) and then fuzzily against titles (rapidfuzz);
+    those hits rank ahead of the semantic results.
     In production, you might want to use a vector database like Chroma, Pinecone, or Vertex AI Vector Search
     """
     
@@ -93,11 +203,18 @@ class KnowledgeBase:
             )
         
         self.use_mysql = use_mysql
-        self.posts: Dict[str, Post] = {}
+        self.storage_path = "knowledge_base.json"
+        # Guards the post index and vector store: searches run in request threads
+        # while admin updates rebuild them. Slow embedding API calls stay outside it.
+        self._index_lock = threading.RLock()
+        self._reset_index()
         
         # Initialize embedding model and vector store (RAG is mandatory)
         self.embeddings = None
         self.vector_store = None
+        # Embedding vectors (float16) keyed by text hash, so rebuilding the vector
+        # store after a post change only calls the embedding API for changed posts
+        self._embedding_cache: Dict[str, np.ndarray] = {}
         
         try:
             # Get OpenAI API key from database or environment
@@ -116,6 +233,10 @@ class KnowledgeBase:
         
         self.load_posts()
         
+        # Seed sample posts on first run (JSON file missing, or nothing in MySQL)
+        if (not self._posts) if self.use_mysql else (not os.path.exists(self.storage_path)):
+            self._seed_samples()
+        
         # Generate embeddings for existing posts
         self._generate_all_embeddings()
     
@@ -141,9 +262,71 @@ class KnowledgeBase:
         # Fallback to environment variable
         return os.getenv('OPENAI_API_KEY')
     
+    @property
+    def posts(self) -> Mapping:
+        """Posts keyed by id (read-only view; use add_post to modify)"""
+        return _PostsView(self._posts, self._id_to_row)
+
+    def _reset_index(self):
+        """Clear the post storage and the lookup structures built at ingest"""
+        # Posts are stored positionally; the row number is the dense doc id
+        self._posts: List[Post] = []
+        self._id_to_row: Dict[str, int] = {}
+        # Lowercased "title\ncontent" of every row, UTF-8 encoded once at ingest into
+        # one contiguous buffer; substring checks use bytearray.find on a row's span
+        # (seg_start, content_start, seg_end) instead of re-lowering post fields
+        self._lc_blob = bytearray()
+        self._lc_spans: List[Tuple[int, int, int]] = []
+        self._title_lower: List[str] = []
+        # Title words with the row they came from, for typo-tolerant title matching
+        # (a re-indexed row keeps its stale words until the next load_posts)
+        self._title_words: List[str] = []
+        self._title_word_rows: List[int] = []
+        # Character trigram -> rows, for exact/CJK matching without a full scan
+        self._trigrams: Dict[str, Set[int]] = {}
+        self._title_trigrams: Dict[str, Set[int]] = {}
+
+    def _index_post(self, post: Post):
+        """Register a post and its derived lookup data"""
+        title_lower = post.title.lower()
+        text_lower = title_lower + "\n" + post.content.lower()
+
+        # Append the encoded text; a re-indexed row simply points at its new span
+        # (the stale bytes are dropped on the next load_posts)
+        seg_start = len(self._lc_blob)
+        self._lc_blob += text_lower.encode("utf-8")
+        span = (seg_start, seg_start + len(title_lower.encode("utf-8")) + 1, len(self._lc_blob))
+
+        row = self._id_to_row.get(post.id)
+        if row is None:
+            row = len(self._posts)
+            self._id_to_row[post.id] = row
+            self._posts.append(post)
+            self._lc_spans.append(span)
+            self._title_lower.append(title_lower)
+        else:
+            # Re-indexing an existing post: drop its old postings first
+            old_start, _, old_end = self._lc_spans[row]
+            for gram in _trigrams(self._lc_blob[old_start:old_end].decode("utf-8")):
+                self._trigrams[gram].discard(row)
+            for gram in _trigrams(self._title_lower[row]):
+                self._title_trigrams[gram].discard(row)
+            self._posts[row] = post
+            self._lc_spans[row] = span
+            self._title_lower[row] = title_lower
+
+        for gram in _trigrams(text_lower):
+            self._trigrams.setdefault(gram, set()).add(row)
+        for gram in _trigrams(title_lower):
+            self._title_trigrams.setdefault(gram, set()).add(row)
+        for word in set(_TOKEN_RE.findall(title_lower)):
+            if len(word) >= _FUZZY_MIN_WORD_LEN:
+                self._title_words.append(word)
+                self._title_word_rows.append(row)
+
     def load_posts(self):
         """Load posts from MySQL database or JSON file"""
-        self.posts = {}
+        posts: List[Post] = []
         if self.use_mysql:
             try:
                 from database import SessionLocal
@@ -161,8 +344,8 @@ class KnowledgeBase:
                             language=db_post.language or "zh-CN",
                             created_at=db_post.created_at.isoformat() if db_post.created_at else None
                         )
-                        self.posts[post.id] = post
-                    print(f"Loaded {len(self.posts)} posts from MySQL database")
+                        posts.append(post)
+                    print(f"Loaded {len(posts)} posts from MySQL database")
                 finally:
                     db.close()
             except Exception as e:
@@ -170,17 +353,22 @@ class KnowledgeBase:
                 print("Falling back to empty posts list")
         else:
             # Fallback to JSON file (for backward compatibility)
-            storage_path = "knowledge_base.json"
+            storage_path = self.storage_path
             if os.path.exists(storage_path):
                 try:
                     with open(storage_path, 'r', encoding='utf-8') as f:
                         data = json.load(f)
                         for post_data in data.get('posts', []):
-                            post = Post(**post_data)
-                            self.posts[post.id] = post
-                    print(f"Loaded {len(self.posts)} posts from {storage_path}")
+                            posts.append(Post(**post_data))
+                    print(f"Loaded {len(posts)} posts from {storage_path}")
                 except Exception as e:
                     print(f"Error loading posts from JSON: {e}")
+
+        # Rebuild the index in one locked step so searches never see it half-filled
+        with self._index_lock:
+            self._reset_index()
+            for post in posts:
+                self._index_post(post)
     
     def save_posts(self):
         """Save posts to MySQL database"""
@@ -191,36 +379,50 @@ class KnowledgeBase:
                 db = SessionLocal()
                 try:
                     # Posts are saved via admin API, this is just for backward compatibility
-                    print(f"Posts are managed via MySQL database (current count: {len(self.posts)})")
+                    print(f"Posts are managed via MySQL database (current count: {len(self._posts)})")
                 finally:
                     db.close()
             except Exception as e:
                 print(f"Error saving posts to MySQL: {e}")
         else:
             # Fallback to JSON file (for backward compatibility)
-            storage_path = "knowledge_base.json"
+            storage_path = self.storage_path
             try:
                 data = {
-                    'posts': [post.model_dump() for post in self.posts.values()]
+                    'posts': [post.model_dump() for post in self._posts]
                 }
                 with open(storage_path, 'w', encoding='utf-8') as f:
                     json.dump(data, f, ensure_ascii=False, indent=2)
-                print(f"Saved {len(self.posts)} posts to {storage_path}")
+                print(f"Saved {len(self._posts)} posts to {storage_path}")
             except Exception as e:
                 print(f"Error saving posts to JSON: {e}")
     
-    def add_post(self, post: Post):
-        """Add a new post"""
-        self.posts[post.id] = post
-        self.save_posts()
+    def add_post(self, post: Post, save: bool = True):
+        """Add a new post (pass save=False when adding in bulk, then call save_posts once)"""
+        with self._index_lock:
+            self._index_post(post)
+        if save:
+            self.save_posts()
         
         # Add to vector store (RAG is mandatory)
         if self.embeddings and self.vector_store:
             self._add_post_to_vector_store(post)
     
+    def _seed_samples(self):
+        """Add the sample posts and persist them with a single save"""
+        sample_posts = _sample_posts()
+        for post in sample_posts:
+            self.add_post(post, save=False)
+        self.save_posts()
+        print(f"Initialized knowledge base with {len(sample_posts)} sample posts")
+    
     def search_posts(self, query: str, top_k: int = 3, language: Optional[str] = None) -> List[SearchResult]:
         """
-        Search posts using RAG (vector embeddings)
+        Search posts in layers: exact -> fuzzy title -> semantic (RAG)
+
+        Single-word queries of 3+ characters are first matched exactly via the
+        trigram index, then, if that finds fewer than top_k posts, fuzzily against
+        titles. Vector search always runs last; duplicates keep their first layer.
 
         Args:
             query: Search query
@@ -237,9 +439,37 @@ class KnowledgeBase:
             raise RuntimeError(
                 "Vector store is not initialized. RAG requires a properly initialized vector store."
             )
-        return self._search_with_rag(query, top_k, language=language)
+        try:
+            # Network call to the embedding API, made before locking the index
+            query_vector = self.embeddings.embed_query(query)
+        except Exception as e:
+            raise RuntimeError(f"RAG search failed: {e}. Please ensure RAG is properly configured.") from e
+        query_lower = query.lower()
+        phrase = _EDGE_RE.sub("", query_lower)
+        ctx = _QueryCtx(
+            phrase=phrase,
+            phrase_bytes=phrase.encode("utf-8"),
+            # Distinct query tokens, encoded once for bytearray.find
+            token_bytes=tuple(t.encode("utf-8") for t in set(_TOKEN_RE.findall(query_lower))),
+            query_vector=query_vector,
+            language=language,
+            # Fetch more candidates when filtering by language
+            fetch_k=top_k * 3 if language else top_k,
+        )
+        # Single-word queries (including unsegmented CJK such as "FastAPI路由") are
+        # also matched exactly via the trigram index, then fuzzily against titles
+        # to tolerate typos; exact hits rank first, semantic hits last
+        layers = []
+        with self._index_lock:
+            if len(phrase) >= 3 and len(phrase.split()) == 1:
+                exact = self._search_with_trigrams(ctx, top_k)
+                layers.append(exact)
+                if len(exact) < top_k and FUZZY_AVAILABLE:
+                    layers.append(self._search_fuzzy_titles(ctx, top_k))
+            layers.append(self._search_with_rag(ctx, top_k))
+        return _merge_layers(layers, top_k)
     
-    def _search_with_rag(self, query: str, top_k: int = 3, language: Optional[str] = None) -> List[SearchResult]:
+    def _search_with_rag(self, ctx: _QueryCtx, top_k: int = 3) -> List[SearchResult]:
         """
         RAG-based search using LangChain FAISS vector store
 
@@ -249,26 +479,25 @@ class KnowledgeBase:
         3. Return top-k most similar posts
         """
         try:
-            # Fetch more candidates when filtering by language
-            fetch_k = top_k * 3 if language else top_k
-            docs_with_scores = self.vector_store.similarity_search_with_score(query, k=fetch_k)
+            docs_with_scores = self.vector_store.similarity_search_with_score_by_vector(ctx.query_vector, k=ctx.fetch_k)
 
             results = []
             for doc, score in docs_with_scores:
                 # Filter by language if specified
-                if language and doc.metadata.get('language', '') != language:
+                if ctx.language and doc.metadata.get('language', '') != ctx.language:
                     continue
                 # Extract post_id from document metadata
                 post_id = doc.metadata.get('post_id')
-                if post_id and post_id in self.posts:
-                    post = self.posts[post_id]
+                row = self._id_to_row.get(post_id) if post_id else None
+                if row is not None:
+                    post = self._posts[row]
                     
                     # Convert distance to similarity score (lower distance = higher similarity)
                     # FAISS returns distance, so we convert it to similarity
                     similarity_score = 1.0 / (1.0 + float(score)) if score > 0 else 1.0
                     
                     # Extract relevant snippet
-                    matched_content = self._extract_relevant_snippet_semantic(post.content, query, max_length=200)
+                    matched_content = self._extract_relevant_snippet_semantic(row, ctx, max_length=200)
                     
                     # Generate reason based on similarity
                     reason = f"Semantic similarity: {similarity_score:.3f}"
@@ -290,6 +519,97 @@ class KnowledgeBase:
             raise RuntimeError(f"RAG search failed: {e}. Please ensure RAG is properly configured.") from e
     
     
+    def _search_with_trigrams(self, ctx: _QueryCtx, top_k: int = 3) -> List[SearchResult]:
+        """
+        Exact substring search by intersecting character-trigram postings
+
+        Candidates contain every trigram of the query in their title or content.
+        Title hits are weighted twice as much as content hits.
+        """
+        grams = _trigrams(ctx.phrase)
+        postings = []
+        for gram in grams:
+            rows = self._trigrams.get(gram)
+            if not rows:
+                return []
+            postings.append(rows)
+        postings.sort(key=len)
+        candidates = set(postings[0]).intersection(*postings[1:])
+
+        blob = self._lc_blob
+        scored = []
+        for row in candidates:
+            post = self._posts[row]
+            if ctx.language and post.language != ctx.language:
+                continue
+            # Trigram postings over-approximate; confirm the exact substring
+            seg_start, _, seg_end = self._lc_spans[row]
+            if blob.find(ctx.phrase_bytes, seg_start, seg_end) < 0:
+                continue
+            title_hits = sum(1 for gram in grams if row in self._title_trigrams.get(gram, ()))
+            # Every query trigram occurs in title+content; title hits count double
+            score = (1.0 + 2.0 * title_hits / len(grams)) / 3.0
+            scored.append((score, row))
+        scored.sort(key=lambda item: item[0], reverse=True)
+
+        results = []
+        for score, row in scored[:top_k]:
+            post = self._posts[row]
+            reason = f"Keyword match: {score:.3f}"
+            if post.tags:
+                reason += f"; Tags: {', '.join(post.tags)}"
+            results.append(SearchResult(
+                post_id=post.id,
+                title=post.title,
+                relevance_score=score,
+                matched_content=self._extract_relevant_snippet_semantic(row, ctx, max_length=200),
+                reason=reason
+            ))
+        return results
+
+    def _search_fuzzy_titles(self, ctx: _QueryCtx, top_k: int = 3) -> List[SearchResult]:
+        """
+        Typo-tolerant title search using rapidfuzz's C implementation
+
+        The single-word query is compared with whole title words by plain edit
+        ratio, so only near-spellings match (e.g. "fastapu" -> "FastAPI"), not
+        unrelated titles that merely share a few letters.
+        """
+        matches = process.extract(
+            ctx.phrase,
+            self._title_words,
+            scorer=fuzz.ratio,
+            processor=None,
+            limit=None,
+            score_cutoff=_FUZZY_SCORE_CUTOFF,
+        )
+
+        results = []
+        seen_rows = set()
+        # Matches come best first, so the first word seen per row is its best
+        for word, score, idx in matches:
+            row = self._title_word_rows[idx]
+            if row in seen_rows or word not in self._title_lower[row]:
+                continue
+            seen_rows.add(row)
+            post = self._posts[row]
+            if ctx.language and post.language != ctx.language:
+                continue
+            relevance = score / 100.0
+            reason = f"Fuzzy title match: {relevance:.3f}"
+            if post.tags:
+                reason += f"; Tags: {', '.join(post.tags)}"
+            results.append(SearchResult(
+                post_id=post.id,
+                title=post.title,
+                relevance_score=relevance,
+                matched_content=self._extract_relevant_snippet_semantic(row, ctx, max_length=200),
+                reason=reason
+            ))
+            if len(results) >= top_k:
+                break
+        return results
+
     def _generate_all_embeddings(self):
         """Generate embeddings and create vector store for all posts"""
         if not self.embeddings:
@@ -297,27 +617,28 @@ class KnowledgeBase:
         
         print("Generating embeddings for all posts using LangChain...")
         
-        # Create documents from posts
-        documents = []
-        for post_id, post in self.posts.items():
-            # Combine title and content for embedding
-            text = f"{post.title}. {post.content}"
-            doc = Document(
-                page_content=text,
-                metadata={
-                    'post_id': post.id,
-                    'title': post.title,
-                    'tags': ', '.join(post.tags) if post.tags else '',
-                    'language': post.language,
-                }
-            )
-            documents.append(doc)
+        with self._index_lock:
+            posts = list(self._posts)
+        texts = [self._embedding_text(post) for post in posts]
+        metadatas = [self._embedding_metadata(post) for post in posts]
         
-        if documents:
+        if texts:
             try:
-                # Create FAISS vector store from documents
-                self.vector_store = FAISS.from_documents(documents, self.embeddings)
-                print(f"Created vector store with {len(documents)} posts")
+                vectors = self._embed_texts(texts)
+                # Drop cached vectors of posts that no longer exist
+                live_keys = {self._embedding_key(text) for text in texts}
+                self._embedding_cache = {k: v for k, v in self._embedding_cache.items() if k in live_keys}
+                # Store vectors as float16 in FAISS: half the memory and bandwidth of
+                # the default float32 flat index; queries stay float32
+                index = faiss.IndexScalarQuantizer(
+                    len(vectors[0]), faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_L2
+                )
+                store = FAISS(self.embeddings, index, InMemoryDocstore(), {})
+                store.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas)
+                # Swap in the finished store; searches keep using the old one until now
+                with self._index_lock:
+                    self.vector_store = store
+                print(f"Created vector store with {len(texts)} posts")
             except Exception as e:
                 raise RuntimeError(
                     f"Failed to create vector store: {e}. "
@@ -330,29 +651,80 @@ class KnowledgeBase:
             return
         
         try:
-            # Create document from post
-            text = f"{post.title}. {post.content}"
-            doc = Document(
-                page_content=text,
-                metadata={
-                    'post_id': post.id,
-                    'title': post.title,
-                    'tags': ', '.join(post.tags) if post.tags else '',
-                    'language': post.language,
-                }
-            )
-            # Add document to existing vector store
-            self.vector_store.add_documents([doc])
+            text = self._embedding_text(post)
+            vectors = self._embed_texts([text])
+            # Add embedding to existing vector store
+            with self._index_lock:
+                self.vector_store.add_embeddings(
+                    list(zip([text], vectors)),
+                    metadatas=[self._embedding_metadata(post)]
+                )
         except Exception as e:
             print(f"Failed to add post to vector store: {e}")
     
-    def _extract_relevant_snippet_semantic(self, content: str, query: str, max_length: int = 200) -> str:
-        """Extract relevant snippet using semantic similarity"""
-        # Simple approach: return beginning of content
-        # In production, you might want to chunk content and find most relevant chunks
-        if len(content) > max_length:
+    @staticmethod
+    def _embedding_text(post: Post) -> str:
+        """Text embedded for a post: title and content combined"""
+        return f"{post.title}. {post.content}"
+    
+    @staticmethod
+    def _embedding_metadata(post: Post) -> Dict:
+        """Vector store metadata for a post"""
+        return {
+            'post_id': post.id,
+            'title': post.title,
+            'tags': ', '.join(post.tags) if post.tags else '',
+            'language': post.language,
+        }
+    
+    @staticmethod
+    def _embedding_key(text: str) -> str:
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+    
+    def _embed_texts(self, texts: List[str]) -> List[np.ndarray]:
+        """Embed texts, calling the embedding API for cache misses only"""
+        keys = [self._embedding_key(text) for text in texts]
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in self._embedding_cache:
+                missing.setdefault(key, text)
+        if missing:
+            pending = list(missing.values())
+            batches = [pending[i:i + _EMBED_BATCH_SIZE] for i in range(0, len(pending), _EMBED_BATCH_SIZE)]
+            if len(batches) == 1:
+                vectors = self.embeddings.embed_documents(batches[0])
+            else:
+                # Embedding calls are network-bound, so shards run concurrently in threads
+                with ThreadPoolExecutor(max_workers=min(_EMBED_MAX_WORKERS, len(batches))) as pool:
+                    vectors = [v for batch in pool.map(self.embeddings.embed_documents, batches) for v in batch]
+            self._embedding_cache.update(
+                (key, np.asarray(vector, dtype=np.float16)) for key, vector in zip(missing.keys(), vectors)
+            )
+        return [self._embedding_cache[key] for key in keys]
+    
+    def _extract_relevant_snippet_semantic(self, row: int, ctx: _QueryCtx, max_length: int = 200) -> str:
+        """Extract a snippet around the first query token found in the post content"""
+        content = self._posts[row].content
+        if len(content) <= max_length:
+            return content
+
+        # Center the window on the earliest query token; fall back to the beginning
+        blob = self._lc_blob
+        _, content_start, seg_end = self._lc_spans[row]
+        hits = [p for p in (blob.find(t, content_start, seg_end) for t in ctx.token_bytes) if p >= 0]
+        if not hits:
             return content[:max_length] + "..."
-        return content
+        # Map the byte offset back to a character offset in the content
+        pos = min(len(blob[content_start:min(hits)].decode("utf-8", "ignore")), len(content) - 1)
+
+        start = max(0, pos - max_length // 4)
+        end = min(len(content), start + max_length)
+        snippet = content[start:end]
+        if start > 0:
+            snippet = "..." + snippet
+        if end < len(content):
+            snippet += "..."
+        return snippet
     
 
 
@@ -500,37 +872,6 @@ def create_knowledge_base_agent() -> Agent:
 
 def initialize_sample_posts():
     """Initialize knowledge base with sample posts"""
-    sample_posts = [
-        Post(
-            id="post_001",
-            title="Python Virtual Environment Guide",
-            content="Python virtual environments are essential tools for isolating project dependencies. Use 'python -m venv venv' to create a virtual environment, and 'source venv/bin/activate' to activate it. Virtual environments help avoid dependency conflicts between different projects.",
-            tags=["Python", "Virtual Environment", "Development Tools"],
-            language="en"
-        ),
-        Post(
-            id="post_002",
-            title="FastAPI Quick Start",
-            content="FastAPI is a modern, fast web framework. It's based on Python type hints and automatically generates API documentation. Use the @app.get() decorator to define routes, and it supports asynchronous request handling.",
-            tags=["FastAPI", "Python", "Web Development"],
-            language="en"
-        ),
-        Post(
-            id="post_003",
-            title="Google ADK Agent Development",
-            content="Google ADK (Agent Development Kit) is a framework for building AI agents. It supports custom tools, plugins, and multi-agent systems. Use the Agent class to create agents, and run them through the Runner.",
-            tags=["Google ADK", "AI", "Agent Development"],
-            language="en"
-        )
-    ]
-    
-    for post in sample_posts:
-        _knowledge_base.add_post(post)
-    
-    print(f"Initialized knowledge base with {len(sample_posts)} sample posts")
-
+    _knowledge_base._seed_samples()
 
-# Initialize with sample data if knowledge base is empty
-if len(_knowledge_base.posts) == 0:
-    initialize_sample_posts()
 
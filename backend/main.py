@@ -1,42 +1,119 @@
+import asyncio
+import os
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+import orjson
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Dict, Optional, List, Set, Tuple
 from google.adk import Runner
+from google.adk.agents.run_config import RunConfig, StreamingMode
+from google.adk.errors.already_exists_error import AlreadyExistsError
 from google.adk.runners import types as runner_types
 from google.adk.sessions.in_memory_session_service import InMemorySessionService
-from adk_agents import get_agent, list_agents
+from adk_agents import get_agent, list_agents, registry_version
 from admin_api import router as admin_router
 from web_api import router as web_router
 from database import init_db, sync_api_keys_to_env
 from models import R
+from post_context import get_cached_post_context, post_context_generation, cache_post_context, fetch_post_context
+
+# protobuf is only needed for older ADK versions that return Struct tool responses
+try:
+    from google.protobuf.json_format import MessageToDict
+    from google.protobuf.message import Message as ProtoMessage
+    PROTOBUF_AVAILABLE = True
+except ImportError:
+    PROTOBUF_AVAILABLE = False
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response serialized with orjson (FastAPI's own ORJSONResponse is deprecated)"""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
 
 app = FastAPI(
     title="Pool AI Knowledge API",
     description="AI Knowledge Base with RAG semantic search and conversational AI",
-    version="0.3.0"
+    version="0.3.0",
+    default_response_class=FastJSONResponse,
 )
 
-# Include routers
-app.include_router(admin_router)
-app.include_router(web_router)
+# ==================== CORS ====================
+
+_CORS_ALLOW_METHODS = b"DELETE, GET, HEAD, OPTIONS, PATCH, POST, PUT"
+
+
+class FastCORS:
+    """
+    Minimal pure-ASGI CORS middleware allowing any origin, with credentials
+
+    Preflight requests are answered directly without entering the app; other
+    cross-origin responses get the allow headers appended to their start message.
+    Requests without an Origin header pass through untouched.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        origin = None
+        request_method = None
+        request_headers = None
+        for name, value in scope["headers"]:
+            if name == b"origin":
+                origin = value
+            elif name == b"access-control-request-method":
+                request_method = value
+            elif name == b"access-control-request-headers":
+                request_headers = value
+
+        if origin is None:
+            await self.app(scope, receive, send)
+            return
+
+        cors_headers = [
+            (b"access-control-allow-origin", origin),
+            (b"access-control-allow-credentials", b"true"),
+            (b"vary", b"Origin"),
+        ]
+
+        # Short-circuit preflight requests
+        if scope["method"] == "OPTIONS" and request_method is not None:
+            cors_headers.append((b"access-control-allow-methods", _CORS_ALLOW_METHODS))
+            if request_headers:
+                cors_headers.append((b"access-control-allow-headers", request_headers))
+            cors_headers.append((b"access-control-max-age", b"600"))
+            await send({"type": "http.response.start", "status": 204, "headers": cors_headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        async def send_with_cors(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + cors_headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_cors)
+
 
 # CORS middleware for Flutter frontend
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+app.add_middleware(FastCORS)
 
 
 # ==================== Global Exception Handlers ====================
 
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=exc.status_code,
         content=R.fail(code=exc.status_code, message=exc.detail),
     )
@@ -44,7 +121,7 @@ async def http_exception_handler(request: Request, exc: HTTPException):
 
 @app.exception_handler(Exception)
 async def general_exception_handler(request: Request, exc: Exception):
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=500,
         content=R.fail(code=500, message=str(exc)),
     )
@@ -77,19 +154,35 @@ class ChatResponse(BaseModel):
 
 # ==================== API Endpoints API 端点 ====================
 
+def _render_json(payload) -> bytes:
+    """Serialize a payload once so static endpoints can return the bytes directly"""
+    return orjson.dumps(payload)
+
+
+def _json_bytes_response(body: bytes) -> Response:
+    return Response(content=body, media_type="application/json")
+
+
+_ROOT_BODY = _render_json(R.ok({
+    "message": "Welcome to Pool AI Knowledge API",
+    "version": "0.3.0",
+    "endpoints": {
+        "chat": "/api/chat",
+        "admin": "/api/admin",
+        "web": "/api/web",
+        "docs": "/docs"
+    }
+}))
+_HEALTH_BODY = _render_json(R.ok({"status": "healthy"}))
+
+# (registry version, rendered /api/agents body), rebuilt when the registry changes
+_agents_body_cache: Tuple[int, bytes] = (-1, b"")
+
+
 @app.get("/")
 async def root():
     """Root endpoint"""
-    return R.ok({
-        "message": "Welcome to Pool AI Knowledge API",
-        "version": "0.3.0",
-        "endpoints": {
-            "chat": "/api/chat",
-            "admin": "/api/admin",
-            "web": "/api/web",
-            "docs": "/docs"
-        }
-    })
+    return _json_bytes_response(_ROOT_BODY)
 
 
 @app.on_event("startup")
@@ -106,28 +199,124 @@ async def startup_event():
 @app.get("/health")
 async def health_check():
     """Health check endpoint / 健康检查端点"""
-    return R.ok({"status": "healthy"})
+    return _json_bytes_response(_HEALTH_BODY)
 
 
 @app.get("/api/agents")
 async def get_available_agents():
     """Get list of available agents / 获取可用代理列表"""
-    agents = list_agents()
-    agent_info = {}
+    global _agents_body_cache
+    version = registry_version()
+    if _agents_body_cache[0] != version:
+        agents = list_agents()
+        agent_info = {}
+
+        for agent_name in agents:
+            agent = get_agent(agent_name)
+            if agent:
+                agent_info[agent_name] = {
+                    "name": agent.name,
+                    "description": agent.description
+                }
+
+        _agents_body_cache = (version, _render_json(R.ok({"agents": agent_info, "total": len(agents)})))
+
+    return _json_bytes_response(_agents_body_cache[1])
+
+
+# (registry version, comma-joined agent names) for "not found" errors
+_agent_names_cache: Tuple[int, str] = (-1, "")
 
-    for agent_name in agents:
-        agent = get_agent(agent_name)
-        if agent:
-            agent_info[agent_name] = {
-                "name": agent.name,
-                "description": agent.description
-            }
 
-    return R.ok({"agents": agent_info, "total": len(agents)})
+def _available_agents_text() -> str:
+    """Comma-joined agent names, rebuilt only when the registry changes / 代理名称列表文本，仅在注册表变化时重建"""
+    global _agent_names_cache
+    version = registry_version()
+    if _agent_names_cache[0] != version:
+        _agent_names_cache = (version, ", ".join(list_agents()))
+    return _agent_names_cache[1]
 
 
 _session_service = InMemorySessionService()
 
+# Sessions already created in _session_service, as (user_id, session_id) / 已创建的会话
+_known_sessions: Set[Tuple[str, str]] = set()
+# Chats touch the sessions on the event loop, admin delete_post from a worker thread
+# 聊天在事件循环中访问会话，管理端 delete_post 在工作线程中访问
+_session_lock = threading.Lock()
+
+
+def _ensure_session(user_id: str, session_id: str):
+    """Create a chat session the first time it is used / 首次使用时创建会话"""
+    session_key = (user_id, session_id)
+    with _session_lock:
+        if session_key in _known_sessions:
+            return
+        try:
+            _session_service.create_session_sync(
+                user_id=user_id,
+                session_id=session_id,
+                app_name="agents"
+            )
+        except AlreadyExistsError:
+            # Created before the key was recorded; reuse it / 会话已存在，直接复用
+            pass
+        _known_sessions.add(session_key)
+
+
+def _forget_session(user_id: str, session_id: str):
+    """Delete a chat session so the next request starts fresh / 删除会话，下次请求重新创建"""
+    with _session_lock:
+        _known_sessions.discard((user_id, session_id))
+        _session_service.delete_session_sync(
+            user_id=user_id,
+            session_id=session_id,
+            app_name="agents"
+        )
+
+
+# One Runner per agent, reused across requests / 每个代理复用一个运行器
+_agent_runners: Dict[str, Runner] = {}
+
+# Dedicated pool for blocking agent runs, so long LLM calls neither queue on nor starve the default executor
+# 代理运行专用线程池，避免耗时的 LLM 调用占满默认执行器
+_ADK_MAX_WORKERS = int(os.getenv("ADK_MAX_WORKERS", "256"))
+_adk_pool = ThreadPoolExecutor(max_workers=_ADK_MAX_WORKERS, thread_name_prefix="adk-")
+
+
+@app.on_event("shutdown")
+async def shutdown_adk_pool():
+    """Release agent worker threads on shutdown / 关闭时释放代理工作线程"""
+    _adk_pool.shutdown(wait=False)
+
+
+def _get_runner(agent_name: str, agent) -> Runner:
+    """Return the cached Runner for an agent, rebuilding it if the agent was replaced (e.g. model change)"""
+    runner = _agent_runners.get(agent_name)
+    if runner is None or runner.agent is not agent:
+        runner = Runner(
+            app_name="agents",
+            agent=agent,
+            session_service=_session_service
+        )
+        _agent_runners[agent_name] = runner
+    return runner
+
+
+# Prompt pieces for chat messages / 聊天消息的提示词片段
+_CONTEXT_TMPL = "Based on this article:\nTitle: {title}\nContent: {content}\n\nUser question: {question}"
+_LANGUAGE_TMPL = "\n\n[IMPORTANT: You MUST respond in {language}.]"
+_LANGUAGE_NAMES = {"zh-CN": "Chinese (Simplified)", "en": "English"}
+
+# Ask the model for partial events so text can be forwarded as it is generated / 请求模型返回增量事件以便边生成边转发
+_SSE_RUN_CONFIG = RunConfig(streaming_mode=StreamingMode.SSE)
+_SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def _sse(payload: dict) -> bytes:
+    """Encode one Server-Sent Events message / 编码一条 SSE 消息"""
+    return b"data: " + orjson.dumps(payload) + b"\n\n"
+
 
 @app.post("/api/chat")
 async def chat_with_agent(request: ChatRequest):
@@ -140,53 +329,40 @@ async def chat_with_agent(request: ChatRequest):
     Returns:
         Agent response / 代理响应
     """
+    loop = asyncio.get_running_loop()
     agent = get_agent(request.agent_name)
     
     if not agent:
         raise HTTPException(
             status_code=404,
-            detail=f"Agent '{request.agent_name}' not found. Available agents: {', '.join(list_agents())}"
+            detail=f"Agent '{request.agent_name}' not found. Available agents: {_available_agents_text()}"
         )
     
     try:
-        # Get agent / 获取代理
-        agent = get_agent(request.agent_name)
-        if not agent:
-            raise HTTPException(
-                status_code=500,
-                detail="Failed to get agent"
-            )
-        
-        # Create a fresh runner for each request to ensure session service is properly linked / 为每个请求创建新的运行器以确保会话服务正确链接
-        # This avoids potential threading issues with shared runners / 这避免了共享运行器的潜在线程问题
-        runner = Runner(
-            app_name="agents",
-            agent=agent,
-            session_service=_session_service
-        )
+        # Reuse the agent's runner; all runners share the same session service / 复用代理的运行器，所有运行器共享同一会话服务
+        runner = _get_runner(request.agent_name.lower(), agent)
         
         # Build message with optional article context
-        message_text = request.message
+        fragments = [request.message]
         if request.post_id:
-            from database import SessionLocal, Post as DBPost
-            db = SessionLocal()
-            try:
-                post = db.query(DBPost).filter(DBPost.id == request.post_id, DBPost.is_active == True).first()
-                if post:
-                    message_text = (
-                        f"Based on this article:\n"
-                        f"Title: {post.title}\n"
-                        f"Content: {post.content}\n\n"
-                        f"User question: {request.message}"
-                    )
-            finally:
-                db.close()
+            # Keep the blocking DB query off the event loop / 阻塞的数据库查询不在事件循环中执行
+            found, post = get_cached_post_context(request.post_id)
+            if not found:
+                generation = post_context_generation(request.post_id)
+                post = await loop.run_in_executor(None, fetch_post_context, request.post_id)
+                cache_post_context(request.post_id, post, generation)
+            if post:
+                fragments[0] = _CONTEXT_TMPL.format_map({
+                    "title": post[0],
+                    "content": post[1],
+                    "question": request.message,
+                })
 
         # Append language instruction if specified
         if request.language:
-            lang_names = {"zh-CN": "Chinese (Simplified)", "en": "English"}
-            lang_name = lang_names.get(request.language, request.language)
-            message_text += f"\n\n[IMPORTANT: You MUST respond in {lang_name}.]"
+            lang_name = _LANGUAGE_NAMES.get(request.language, request.language)
+            fragments.append(_LANGUAGE_TMPL.format_map({"language": lang_name}))
+        message_text = "".join(fragments)
 
         # Create Content object from message
         content = runner_types.Content(parts=[{"text": message_text}], role="user")
@@ -197,156 +373,219 @@ async def chat_with_agent(request: ChatRequest):
         session_id = f"api_{request.agent_name}"
         user_id = "api_user"
         
-        # Always create session first to ensure it exists / 始终先创建会话以确保它存在
-        # Directly create session (will not fail if already exists) / 直接创建会话（如果已存在则不会失败）
+        # Create the session once, then reuse it / 会话只创建一次，之后复用
         try:
-            _session_service.create_session_sync(
-                user_id=user_id,
-                session_id=session_id,
-                app_name="agents"
-            )
+            _ensure_session(user_id, session_id)
         except Exception as create_error:
-            # If creation fails, try to get existing session / 如果创建失败，尝试获取现有会话
-            try:
-                _session_service.get_session_sync(
-                    user_id=user_id,
-                    session_id=session_id,
-                    app_name="agents"
-                )
-            except Exception:
-                # If both fail, raise error / 如果两者都失败，抛出错误
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Failed to create or get session: {str(create_error)}"
-                )
-        
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to create session: {str(create_error)}"
+            )
+
+        if request.stream:
+            # Stream text deltas as Server-Sent Events, then the references / 以 SSE 流式返回文本增量，最后返回引用
+            # The agent runs on the ADK pool like the JSON path so sync tools (search_knowledge_base)
+            # never block the event loop; events come back through an asyncio.Queue
+            # 与 JSON 路径一样在 ADK 线程池中运行代理，避免同步工具阻塞事件循环；事件通过 asyncio.Queue 传回
+            events: asyncio.Queue = asyncio.Queue()
+            stop = threading.Event()
+
+            def forward(item):
+                try:
+                    loop.call_soon_threadsafe(events.put_nowait, item)
+                except RuntimeError:
+                    # Event loop already closed / 事件循环已关闭
+                    pass
+
+            def run_agent_streaming():
+                """Run agent in thread and forward its events / 在线程中运行代理并转发事件"""
+                try:
+                    with closing(runner.run(
+                        user_id=user_id,
+                        session_id=session_id,
+                        new_message=content,
+                        run_config=_SSE_RUN_CONFIG
+                    )) as agent_events:
+                        for event in agent_events:
+                            if stop.is_set():
+                                break
+                            forward(event)
+                except Exception as run_error:
+                    forward(run_error)
+                finally:
+                    forward(None)
+
+            async def event_source():
+                accumulator = ResponseAccumulator()
+                streamed = False
+                loop.run_in_executor(_adk_pool, run_agent_streaming)
+                try:
+                    while True:
+                        event = await events.get()
+                        if event is None:
+                            break
+                        if isinstance(event, Exception):
+                            raise event
+                        if event.partial:
+                            parts = event.content.parts if event.content else None
+                            for part in parts or ():
+                                if part.text:
+                                    streamed = True
+                                    yield _sse({"delta": part.text})
+                            continue
+                        accumulator.feed(event)
+                    result = accumulator.finalize()
+                    # Model did not stream: send the whole answer as one delta / 模型未流式输出时一次性发送完整回答
+                    if not streamed:
+                        yield _sse({"delta": result["text"]})
+                    yield _sse({"references": result["references"], "done": True})
+                except Exception as run_error:
+                    print(f"Error streaming agent '{request.agent_name}': {run_error!r}")
+                    traceback.print_exc()
+                    yield _sse({"error": f"Error running agent: {run_error.__class__.__name__}"})
+                finally:
+                    # Client went away: let the worker stop the run / 客户端断开时通知工作线程停止运行
+                    stop.set()
+
+            return StreamingResponse(event_source(), media_type="text/event-stream", headers=_SSE_HEADERS)
+
         # Run the agent / 运行代理
-        # Use asyncio.to_thread to run sync runner.run() in a separate thread / 使用 asyncio.to_thread 在单独线程中运行同步 runner.run()
+        # Run sync runner.run() on the dedicated agent pool / 在代理专用线程池中运行同步 runner.run()
         # This ensures the session service is accessible in the thread / 这确保会话服务在线程中可访问
-        import asyncio
-        
         def run_agent_sync():
             """Run agent synchronously in thread / 在线程中同步运行代理"""
-            try:
-                # Double-check session exists in thread / 在线程中再次检查会话是否存在
-                _session_service.get_session_sync(
-                    user_id=user_id,
-                    session_id=session_id,
-                    app_name="agents"
-                )
-            except Exception as e:
-                raise RuntimeError(f"Session not accessible in thread: {e}")
-            
-            return list(runner.run(
+            # Consume events as they arrive instead of buffering the whole run / 逐个处理事件，而不是缓存整个运行过程
+            accumulator = ResponseAccumulator()
+            for event in runner.run(
                 user_id=user_id,
                 session_id=session_id,
                 new_message=content
-            ))
+            ):
+                accumulator.feed(event)
+            return accumulator.finalize()
         
         try:
             # Run in thread to avoid blocking / 在线程中运行以避免阻塞
-            events = await asyncio.to_thread(run_agent_sync)
-            result = _extract_response_from_events(events)
+            result = await loop.run_in_executor(_adk_pool, run_agent_sync)
         except Exception as run_error:
-            import traceback
-            error_details = traceback.format_exc()
+            # Traceback goes to the server log only, not into the response / 堆栈只输出到服务端日志，不返回给客户端
+            print(f"Error running agent '{request.agent_name}': {run_error!r}")
+            traceback.print_exc()
             raise HTTPException(
                 status_code=500,
-                detail=f"Error running agent: {str(run_error)}\nDetails: {error_details[:500]}"
+                detail=f"Error running agent: {run_error.__class__.__name__}"
             )
 
-        return R.ok(ChatResponse(
+        return FastJSONResponse(R.ok(ChatResponse(
             agent_name=request.agent_name,
             message=request.message,
             response=result["text"],
             references=[ChatReference(**ref) for ref in result["references"]],
             status="success"
-        ).model_dump())
+        ).model_dump()))
+    except HTTPException:
+        raise
     except Exception as e:
+        print(f"Error handling chat for agent '{request.agent_name}': {e!r}")
+        traceback.print_exc()
         raise HTTPException(
             status_code=500,
-            detail=f"Error running agent: {str(e)}"
+            detail=f"Error running agent: {e.__class__.__name__}"
         )
 
 
-def _extract_response_from_events(events: List, debug: bool = False) -> dict:
+class ResponseAccumulator:
     """
-    Extract text response and references from agent events.
+    Incrementally extract the text response and references from agent events.
 
-    Returns:
-        dict with keys "text" and "references"
+    Call feed() for each event as it is produced, then finalize() once the
+    run is over; events do not need to be kept around.
     """
-    references = []
-    response_text = ""
-
-    if not events:
-        return {"text": "No response generated", "references": []}
-
-    # Pass 1: extract search_knowledge_base function_response results
-    for event in events:
-        if not (hasattr(event, 'content') and event.content and hasattr(event.content, 'parts')):
-            continue
-        for part in event.content.parts:
-            if hasattr(part, 'function_response') and part.function_response:
-                fr = part.function_response
-                if getattr(fr, 'name', '') == 'search_knowledge_base':
-                    try:
-                        resp = fr.response if hasattr(fr, 'response') else {}
-                        # ADK returns protobuf Struct, not plain dict; convert it
-                        if not isinstance(resp, dict):
-                            try:
-                                resp = dict(resp)
-                            except (TypeError, ValueError):
-                                resp = {}
-                        results = resp.get('results', [])
-                        for r in results:
-                            # Convert protobuf MapComposite to dict if needed
-                            if not isinstance(r, dict):
-                                try:
-                                    r = dict(r)
-                                except (TypeError, ValueError):
-                                    continue
-                            if r.get('post_id') and r.get('title'):
-                                references.append({
-                                    "post_id": str(r["post_id"]),
-                                    "title": str(r["title"]),
-                                })
-                    except Exception:
-                        pass
-
-    # Pass 2: extract final text response
-    for event in events:
+
+    def __init__(self):
+        self.references = []
+        self._seen_refs = set()
+        self.final_text = ""
+        self.fallback_parts = []
+        self.event_count = 0
+
+    def feed(self, event):
+        """Process a single agent event"""
+        self.event_count += 1
+        # Tool calls precede the final response, so nothing after it matters
+        if self.final_text:
+            return
         try:
-            if hasattr(event, 'is_final_response') and event.is_final_response():
-                if hasattr(event, 'content') and event.content and hasattr(event.content, 'parts'):
-                    for part in event.content.parts:
-                        if hasattr(part, 'text') and part.text:
-                            response_text = part.text
-                            break
-                if response_text:
-                    break
+            parts = event.content.parts
+        except AttributeError:
+            return
+        if not parts:
+            return
+        try:
+            is_final = event.is_final_response()
+        except Exception:
+            is_final = False
+
+        # One pass over the parts: search_knowledge_base results, then text
+        for part in parts:
+            fr = getattr(part, "function_response", None)
+            if fr is not None:
+                if getattr(fr, "name", "") == "search_knowledge_base":
+                    self._collect_references(getattr(fr, "response", None))
+                continue
+            text = getattr(part, "text", None)
+            if not text:
+                continue
+            # Final text response: first text part of the first final event
+            if is_final and not self.final_text:
+                self.final_text = text
+            # Fallback: collect all text parts
+            self.fallback_parts.append(text)
+
+        if self.final_text:
+            self.fallback_parts = []
+
+    def _collect_references(self, resp):
+        """Append post references from a search_knowledge_base response"""
+        try:
+            # Current ADK hands back a plain dict; older versions used a protobuf Struct,
+            # which is converted in one pass so every result below is a plain dict too
+            if not isinstance(resp, dict):
+                if PROTOBUF_AVAILABLE and isinstance(resp, ProtoMessage):
+                    resp = MessageToDict(resp, preserving_proto_field_name=True)
+                else:
+                    try:
+                        resp = dict(resp)
+                    except (TypeError, ValueError):
+                        return
+            for r in resp.get('results', []):
+                if not isinstance(r, dict):
+                    try:
+                        r = dict(r)
+                    except (TypeError, ValueError):
+                        continue
+                if r.get('post_id') and r.get('title'):
+                    # Deduplicate references by post_id as they arrive
+                    pid = str(r["post_id"])
+                    if pid not in self._seen_refs:
+                        self._seen_refs.add(pid)
+                        self.references.append({"post_id": pid, "title": str(r["title"])})
         except Exception:
             pass
 
-    # Fallback: collect all text parts
-    if not response_text:
-        parts = []
-        for event in events:
-            if hasattr(event, 'content') and event.content and hasattr(event.content, 'parts'):
-                for part in event.content.parts:
-                    if hasattr(part, 'text') and part.text:
-                        parts.append(part.text)
-        response_text = '\n'.join(parts) if parts else "Sorry, I'm unable to generate a response right now. Please try again later."
+    def finalize(self) -> dict:
+        """
+        Returns:
+            dict with keys "text" and "references"
+        """
+        if not self.event_count:
+            return {"text": "No response generated", "references": []}
 
-    # Deduplicate references by post_id
-    seen = set()
-    unique_refs = []
-    for ref in references:
-        if ref["post_id"] not in seen:
-            seen.add(ref["post_id"])
-            unique_refs.append(ref)
+        response_text = self.final_text
+        if not response_text:
+            response_text = '\n'.join(self.fallback_parts) if self.fallback_parts else "Sorry, I'm unable to generate a response right now. Please try again later."
 
-    return {"text": response_text, "references": unique_refs}
+        return {"text": response_text, "references": self.references}
 
 
 @app.get("/api/agents/{agent_name}/info")
@@ -365,7 +604,7 @@ async def get_agent_info(agent_name: str):
     if not agent:
         raise HTTPException(
             status_code=404,
-            detail=f"Agent '{agent_name}' not found. Available agents: {', '.join(list_agents())}"
+            detail=f"Agent '{agent_name}' not found. Available agents: {_available_agents_text()}"
         )
     
     return R.ok({
@@ -376,6 +615,14 @@ async def get_agent_info(agent_name: str):
         "tools": [tool.__name__ if hasattr(tool, '__name__') else str(tool) for tool in agent.tools] if hasattr(agent, 'tools') else []
     })
 
+
+# Include routers after the endpoints above, so routing tries /api/chat before the admin/web routes
+# 在上面的端点之后挂载路由，使路由匹配先尝试 /api/chat，再尝试 admin/web 路由
+app.include_router(admin_router)
+app.include_router(web_router)
+
 if __name__ == "__main__":
+    import sys
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # uvloop is not available on Windows / Windows 上没有 uvloop
+    uvicorn.run(app, host="0.0.0.0", port=8000, loop="asyncio" if sys.platform == "win32" else "uvloop", http="httptools")
@@ -0,0 +1,59 @@
+"""
+Cached article context for chats about a post
+针对文章聊天时使用的文章上下文缓存
+"""
+
+import threading
+from typing import Dict, Optional, Tuple
+
+from cachetools import TTLCache
+
+from database import SessionLocal, Post
+
+# (title, content) keyed by post_id; None marks a missing/inactive post / 按 post_id 缓存 (标题, 内容)，None 表示文章不存在或未启用
+_cache: TTLCache = TTLCache(maxsize=1024, ttl=60)
+# Chat requests read on the event loop while admin endpoints invalidate from worker threads
+# 聊天请求在事件循环中读取，管理端点在工作线程中使缓存失效
+_lock = threading.Lock()
+# Bumped on every invalidation, so a fetch that started before an edit cannot cache the old row
+# 每次失效时递增，避免编辑前开始的查询把旧数据写回缓存
+_generations: Dict[str, int] = {}
+
+
+def get_cached_post_context(post_id: str) -> Tuple[bool, Optional[Tuple[str, str]]]:
+    """Return (found, context) from the cache / 从缓存中返回 (是否命中, 上下文)"""
+    with _lock:
+        try:
+            return True, _cache[post_id]
+        except KeyError:
+            return False, None
+
+
+def post_context_generation(post_id: str) -> int:
+    """Read before fetching, then pass to cache_post_context / 查询前读取，之后传给 cache_post_context"""
+    with _lock:
+        return _generations.get(post_id, 0)
+
+
+def cache_post_context(post_id: str, context: Optional[Tuple[str, str]], generation: int):
+    """Store the context of a post unless it changed since the fetch began / 缓存文章上下文（查询期间文章已变更则不缓存）"""
+    with _lock:
+        if _generations.get(post_id, 0) == generation:
+            _cache[post_id] = context
+
+
+def invalidate_post_context(post_id: str):
+    """Drop the cached context of a post after it changes / 文章变更后清除其缓存上下文"""
+    with _lock:
+        _generations[post_id] = _generations.get(post_id, 0) + 1
+        _cache.pop(post_id, None)
+
+
+def fetch_post_context(post_id: str) -> Optional[Tuple[str, str]]:
+    """Load (title, content) of an active post; blocking, run it in a worker thread / 加载文章标题和内容（阻塞调用，应在工作线程中执行）"""
+    db = SessionLocal()
+    try:
+        post = db.query(Post).filter(Post.id == post_id, Post.is_active == True).first()
+        return (post.title, post.content) if post else None
+    finally:
+        db.close()
@@ -225,7 +225,7 @@ Group=${APP_USER}
 WorkingDirectory=${APP_DIR}
 Environment="PATH=${VENV_DIR}/bin:/usr/bin:/bin"
 EnvironmentFile=${APP_DIR}/.env
-ExecStart=${VENV_DIR}/bin/uvicorn main:app --host 0.0.0.0 --port ${APP_PORT} --workers 2
+ExecStart=${VENV_DIR}/bin/uvicorn main:app --host 0.0.0.0 --port ${APP_PORT} --workers 2 --loop uvloop --http httptools
 Restart=always
 RestartSec=5
 StandardOutput=journal
@@ -4,145 +4,216 @@ Test script for knowledge base agent
 """
 
 import asyncio
-from knowledge_base_agent import create_knowledge_base_agent
+import functools
+import os
+import sys
+import threading
+import traceback
+from collections import OrderedDict
+import orjson
+from knowledge_base_agent import create_knowledge_base_agent, search_knowledge_base
 from google.adk import Runner
 from google.adk.runners import types
 from google.adk.sessions.in_memory_session_service import InMemorySessionService
 from google.adk.sessions.session import Session
+from main import ResponseAccumulator
 
 
-async def test_agent_async():
-    """Test agent with async runner / 使用异步运行器测试代理"""
-    print("=" * 60)
-    print("Testing Knowledge Base Agent (Async)")
-    print("测试知识库代理（异步）")
-    print("=" * 60)
-    
-    # Create agent / 创建代理
+# Shared by both tests / 两个测试共用
+_SESSION_SERVICE = InMemorySessionService()
+_USER_ID = "test_user"
+
+# Sessions created by the tests, oldest first; at most _MAX_SESSIONS are kept / 测试创建的会话（按创建顺序），最多保留 _MAX_SESSIONS 个
+_MAX_SESSIONS = 128
+_sessions: "OrderedDict[str, None]" = OrderedDict()
+_sessions_lock = threading.Lock()  # the sync test runs in a worker thread / 同步测试在工作线程中运行
+
+# Per-event details are printed only at debug level; set POOL_AI_TEST_LOG=info for quiet runs
+# 仅在 debug 级别打印事件详情；设置 POOL_AI_TEST_LOG=info 可静默运行
+_DEBUG = os.getenv("POOL_AI_TEST_LOG", "debug").lower() == "debug"
+
+# Only the first few events are printed in detail / 只详细打印前几个事件
+_DEBUG_EVENT_LIMIT = 10
+# Max bytes of each event's JSON dump / 每个事件 JSON 输出的最大字节数
+_DEBUG_DUMP_LIMIT = 300
+
+_BAR = "=" * 60
+
+# Test prompt shared by both tests; the runner only reads it / 两个测试共用的提示，运行器只读取不修改
+_TEST_CONTENT = types.Content(parts=[{"text": "如何使用 Python 虚拟环境？"}])
+
+
+@functools.lru_cache(maxsize=32)
+def _public_attrs(cls) -> tuple:
+    """Public field names of an event type, computed once per type / 事件类型的公开字段名，每种类型只计算一次"""
+    fields = getattr(cls, "model_fields", None)
+    names = fields.keys() if fields else getattr(cls, "__slots__", ())
+    return tuple(name for name in names if not name.startswith("_"))
+
+
+def _json_default(value):
+    """orjson fallback: pydantic models as dicts, anything else as str / orjson 回退：pydantic 模型转字典，其他转字符串"""
+    dump = getattr(value, "model_dump", None)
+    return dump(exclude_none=True) if dump else str(value)
+
+
+def _banner(title_en: str, title_zh: str):
+    """Print a bilingual section header / 打印双语标题"""
+    print(_BAR)
+    print(title_en)
+    print(title_zh)
+    print(_BAR)
+
+
+@functools.lru_cache(maxsize=1)
+def _get_runner() -> Runner:
+    """Build the agent and its runner once / 只构建一次代理及其运行器"""
     agent = create_knowledge_base_agent()
-    
-    # Create session service / 创建会话服务
-    session_service = InMemorySessionService()
-    
-    # Create session / 创建会话
-    session_service.create_session_sync(
-        user_id="test_user",
-        session_id="test_session_async",
+    return Runner(app_name="knowledge", agent=agent, session_service=_SESSION_SERVICE)
+
+
+def _delete_session(session_id: str):
+    """Remove a test session from the shared service / 从共用服务中删除测试会话"""
+    _SESSION_SERVICE.delete_session_sync(
+        user_id=_USER_ID,
+        session_id=session_id,
         app_name="knowledge"
     )
+
+
+def _start_session(session_id: str) -> Runner:
+    """Create a fresh test session and return the shared runner / 创建新的测试会话并返回共用运行器"""
+    runner = _get_runner()
+    with _sessions_lock:
+        # Rerunning a test replaces its old session / 重复运行测试时替换旧会话
+        if session_id in _sessions:
+            del _sessions[session_id]
+            _delete_session(session_id)
+        _SESSION_SERVICE.create_session_sync(
+            user_id=_USER_ID,
+            session_id=session_id,
+            app_name="knowledge"
+        )
+        _sessions[session_id] = None
+        # Evict the oldest sessions so repeated runs don't grow memory / 淘汰最旧的会话，避免重复运行导致内存增长
+        while len(_sessions) > _MAX_SESSIONS:
+            oldest, _ = _sessions.popitem(last=False)
+            _delete_session(oldest)
+    return runner
+
+
+def _report_event(accumulator: ResponseAccumulator, event):
+    """Fold one event into the response and print its details at debug level / 将事件累积到响应中，debug 级别下打印详情"""
+    accumulator.feed(event)
+    if not _DEBUG or accumulator.event_count > _DEBUG_EVENT_LIMIT:
+        return
+    
+    # Dump the non-empty public fields as JSON, one write per event / 以 JSON 输出非空公开字段，每个事件只写一次
+    fields = {}
+    for key in _public_attrs(type(event)):
+        value = getattr(event, key, None)
+        if value is not None:
+            fields[key] = value
+    payload = orjson.dumps(fields, default=_json_default, option=orjson.OPT_NON_STR_KEYS)
+    dump = payload[:_DEBUG_DUMP_LIMIT].decode(errors="ignore")
+    if len(payload) > _DEBUG_DUMP_LIMIT:
+        dump += "..."
+    sys.stdout.write(f"\nEvent {accumulator.event_count}: {type(event).__name__}\n  {dump}\n")
+
+
+def _report_response(accumulator: ResponseAccumulator):
+    """Print the event count and the extracted response / 打印事件总数和提取的响应"""
+    print(f"\nTotal events: {accumulator.event_count}")
     
-    # Create runner / 创建运行器
-    runner = Runner(app_name="knowledge", agent=agent, session_service=session_service)
+    # Extract response / 提取响应
+    response = accumulator.finalize()
     
-    # Create content / 创建内容
-    content = types.Content(parts=[{"text": "如何使用 Python 虚拟环境？"}])
+    print(f"\n{_BAR}")
+    print("Response / 响应:")
+    print(_BAR)
+    print(response)
+    print(f"{_BAR}\n")
+
+
+async def test_agent_async():
+    """Test agent with async runner / 使用异步运行器测试代理"""
+    _banner("Testing Knowledge Base Agent (Async)", "测试知识库代理（异步）")
+    runner = _start_session("test_session_async")
     
     print("\nRunning agent asynchronously...")
     print("异步运行代理...\n")
     
-    events = []
+    # Fold events into the response as they arrive instead of keeping them / 事件到达时即累积到响应中，不保留事件本身
+    accumulator = ResponseAccumulator()
     try:
         # Use run_async / 使用 run_async
         async for event in runner.run_async(
-            parent_context=None
+            user_id=_USER_ID,
+            session_id="test_session_async",
+            new_message=_TEST_CONTENT
         ):
-            events.append(event)
-            print(f"Event received: {type(event).__name__}")
-            # Print event details / 打印事件详情
-            if hasattr(event, '__dict__'):
-                for key, value in event.__dict__.items():
-                    if not key.startswith('_'):
-                        print(f"  {key}: {str(value)[:100]}")
+            _report_event(accumulator, event)
+            # Let other coroutines run between bursts of events / 在连续事件之间让出事件循环
+            await asyncio.sleep(0)
     except Exception as e:
         print(f"Error: {e}")
-        import traceback
         traceback.print_exc()
     
-    print(f"\nTotal events: {len(events)}")
-    
-    # Extract response / 提取响应
-    from main import _extract_response_from_events
-    response = _extract_response_from_events(events, debug=True)
-    
-    print(f"\n{'='*60}")
-    print("Response / 响应:")
-    print(f"{'='*60}")
-    print(response)
-    print(f"{'='*60}\n")
+    _report_response(accumulator)
 
 
 def test_agent_sync():
     """Test agent with sync runner / 使用同步运行器测试代理"""
-    print("=" * 60)
-    print("Testing Knowledge Base Agent (Sync)")
-    print("测试知识库代理（同步）")
-    print("=" * 60)
-    
-    # Create agent / 创建代理
-    agent = create_knowledge_base_agent()
-    
-    # Create session service / 创建会话服务
-    session_service = InMemorySessionService()
-    
-    # Create session / 创建会话
-    session_service.create_session_sync(
-        user_id="test_user",
-        session_id="test_session_sync",
-        app_name="knowledge"
-    )
-    
-    # Create runner / 创建运行器
-    runner = Runner(app_name="knowledge", agent=agent, session_service=session_service)
-    
-    # Create content / 创建内容
-    content = types.Content(parts=[{"text": "如何使用 Python 虚拟环境？"}])
+    _banner("Testing Knowledge Base Agent (Sync)", "测试知识库代理（同步）")
+    runner = _start_session("test_session_sync")
     
     print("\nRunning agent synchronously...")
     print("同步运行代理...\n")
     
+    # Fold events into the response as they arrive instead of keeping them / 事件到达时即累积到响应中，不保留事件本身
+    accumulator = ResponseAccumulator()
     try:
-        events = list(runner.run(
-            user_id="test_user",
+        for event in runner.run(
+            user_id=_USER_ID,
             session_id="test_session_sync",
-            new_message=content
-        ))
-        
-        print(f"Total events: {len(events)}")
-        
-        # Print event types / 打印事件类型
-        for i, event in enumerate(events):
-            print(f"\nEvent {i+1}: {type(event).__name__}")
-            if hasattr(event, '__dict__'):
-                for key, value in list(event.__dict__.items())[:5]:  # First 5 attributes
-                    if not key.startswith('_'):
-                        val_str = str(value)
-                        if len(val_str) > 100:
-                            val_str = val_str[:100] + "..."
-                        print(f"  {key}: {val_str}")
-        
-        # Extract response / 提取响应
-        from main import _extract_response_from_events
-        response = _extract_response_from_events(events, debug=True)
-        
-        print(f"\n{'='*60}")
-        print("Response / 响应:")
-        print(f"{'='*60}")
-        print(response)
-        print(f"{'='*60}\n")
-        
+            new_message=_TEST_CONTENT
+        ):
+            _report_event(accumulator, event)
     except Exception as e:
         print(f"Error: {e}")
-        import traceback
         traceback.print_exc()
+    
+    _report_response(accumulator)
+
+
+def _warm_up():
+    """Build the shared runner and run one retrieval before the tests / 测试前构建共用运行器并执行一次检索"""
+    _get_runner()
+    try:
+        # Warms the embedding client and search index without spending an LLM call / 预热向量化客户端和检索索引，不消耗 LLM 调用
+        search_knowledge_base(_TEST_CONTENT.parts[0].text)
+    except Exception as e:
+        print(f"Warm-up search failed: {e}")
+
+
+async def _run_all():
+    """Run the sync and async tests at the same time / 同时运行同步和异步测试"""
+    await asyncio.gather(asyncio.to_thread(test_agent_sync), test_agent_async())
 
 
 if __name__ == "__main__":
     print("\nTesting Knowledge Base Agent")
     print("测试知识库代理\n")
     
-    # Test sync first / 先测试同步
-    test_agent_sync()
+    # Use uvloop for the async test when available / 如果可用，异步测试使用 uvloop
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
+    
+    _warm_up()
     
-    # Then test async / 然后测试异步
-    # asyncio.run(test_agent_async())
+    # Run both tests concurrently; the sync one in a worker thread / 并发运行两个测试，同步测试在工作线程中运行
+    asyncio.run(_run_all())
 
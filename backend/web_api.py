@@ -16,7 +16,7 @@ router = APIRouter(prefix="/api/web", tags=["Web"])
 # ==================== Post Endpoints ====================
 
 @router.get("/posts")
-async def list_posts(
+def list_posts(
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
     language: Optional[str] = Query(None),
@@ -48,7 +48,7 @@ async def list_posts(
 
 
 @router.get("/posts/{post_id}")
-async def get_post(post_id: str, db: Session = Depends(get_db)):
+def get_post(post_id: str, db: Session = Depends(get_db)):
     """Get post by ID (public access)"""
     post = db.query(Post).filter(Post.id == post_id, Post.is_active == True).first()
     if not post:
@@ -71,7 +71,7 @@ async def get_post(post_id: str, db: Session = Depends(get_db)):
 # ==================== Search Endpoints ====================
 
 @router.post("/search")
-async def search_posts(search_request: SearchRequest):
+def search_posts(search_request: SearchRequest):
     """Search posts using RAG (public access), optionally filtered by language"""
     try:
         result = search_knowledge_base(
@@ -83,7 +83,7 @@ async def search_posts(search_request: SearchRequest):
 
 
 @router.get("/search")
-async def search_posts_get(
+def search_posts_get(
     query: str = Query(..., min_length=1),
     top_k: int = Query(3, ge=1, le=20),
     language: Optional[str] = Query(None),
@@ -296,7 +296,7 @@ Group=${APP_USER}
 WorkingDirectory=${APP_DIR}/backend
 Environment="PATH=${VENV_DIR}/bin:/usr/bin:/bin"
 EnvironmentFile=${APP_DIR}/backend/.env
-ExecStart=${VENV_DIR}/bin/uvicorn main:app --host 127.0.0.1 --port ${API_PORT} --workers 2
+ExecStart=${VENV_DIR}/bin/uvicorn main:app --host 127.0.0.1 --port ${API_PORT} --workers 2 --loop uvloop --http httptools
 Restart=always
 RestartSec=5
 StandardOutput=journal